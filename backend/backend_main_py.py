@@ -5,23 +5,28 @@ Handles file uploads, intent detection, and task execution
 
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from typing import Optional
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from typing import AsyncIterator, Optional
 import os
+import json
 import logging
 from dotenv import load_dotenv
 import tempfile
-import shutil
+import aiofiles
 
-from services.intent_detector import IntentDetector
+# Load environment variables before the services read their settings at import
+load_dotenv()
+
+from services.intent_detector import IntentDetector, YOUTUBE_URL_RE
 from services.file_processor import FileProcessor
-from services.task_executor import TaskExecutor
+from services.task_executor import BatchingTaskExecutor, TaskExecutor, close_clients
 from services.youtube_service import YouTubeService
 from utils.validators import validate_file_size, validate_file_type
 from utils.logger import setup_logger
+from utils.config import WEB_WORKERS
 
-# Load environment variables
-load_dotenv()
+# Uploads are copied to disk in chunks of this size (1MB)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
 # Setup logging
 logger = setup_logger(__name__)
@@ -30,7 +35,8 @@ logger = setup_logger(__name__)
 app = FastAPI(
     title="Agentic Multi-Modal System",
     description="Autonomous AI agent for processing text, images, PDFs, and audio",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -45,9 +51,62 @@ app.add_middleware(
 # Initialize services
 intent_detector = IntentDetector()
 file_processor = FileProcessor()
-task_executor = TaskExecutor(api_key=os.getenv("ANTHROPIC_API_KEY"))
+# Coalescing concurrent requests trades a little latency for fewer Claude calls; it mixes
+# different users' content in one prompt, so it is only safe for single-tenant use
+executor_class = BatchingTaskExecutor if os.getenv("BATCH_CLAUDE_REQUESTS", "false").lower() == "true" else TaskExecutor
+task_executor = executor_class(api_key=os.getenv("ANTHROPIC_API_KEY"))
 youtube_service = YouTubeService()
 
+# File processors keyed by exact content type or by its top-level type
+FILE_HANDLERS = {
+    'image': file_processor.process_image,
+    'application/pdf': file_processor.process_pdf,
+    'audio': file_processor.process_audio,
+}
+
+# Types whose processor needs a path on disk (Whisper); others read the upload in place
+DISK_BACKED_TYPES = frozenset({'audio'})
+
+@app.on_event("shutdown")
+async def close_http_client():
+    """Close pooled HTTP connections on shutdown"""
+    await close_clients()
+
+async def save_upload_to_temp(file: UploadFile) -> str:
+    """
+    Stream an upload to a temporary file without blocking the event loop
+    
+    Args:
+        file: Uploaded file
+    
+    Returns:
+        Path of the temporary file (caller is responsible for removing it)
+    """
+    fd, temp_file_path = tempfile.mkstemp(suffix=os.path.splitext(file.filename)[1])
+    os.close(fd)
+    
+    await file.seek(0)
+    async with aiofiles.open(temp_file_path, 'wb') as out:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            await out.write(chunk)
+    
+    return temp_file_path
+
+async def stream_events(intent: str, chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    Format a streamed task result as Server-Sent Events
+    
+    Emits an 'intent' event first, one data frame per text chunk, then a 'done' event
+    """
+    yield f"event: intent\ndata: {json.dumps({'intent': intent})}\n\n"
+    try:
+        async for chunk in chunks:
+            yield f"data: {json.dumps({'text': chunk})}\n\n"
+    finally:
+        # A disconnected client stops iteration; release the upstream stream right away
+        await chunks.aclose()
+    yield "event: done\ndata: {}\n\n"
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -73,7 +132,8 @@ async def health_check():
 @app.post("/api/process")
 async def process_request(
     text: str = Form(""),
-    file: Optional[UploadFile] = File(None)
+    file: Optional[UploadFile] = File(None),
+    stream: bool = Form(False)
 ):
     """
     Main endpoint for processing user requests
@@ -81,14 +141,16 @@ async def process_request(
     Args:
         text: User's text input or query
         file: Optional file upload (image, PDF, or audio)
+        stream: Stream the task result as Server-Sent Events instead of one JSON body
     
     Returns:
-        JSON response with intent, extracted content, and task result
+        JSON response with intent, extracted content, and task result,
+        or a text/event-stream response when stream is set
     """
     temp_file_path = None
     
     try:
-        logger.info(f"Processing request - Text length: {len(text)}, File: {file.filename if file else None}")
+        logger.info("Processing request - Text length: %s, File: %s", len(text), file.filename if file else None)
         
         # Validate inputs
         if not text.strip() and not file:
@@ -103,29 +165,31 @@ async def process_request(
         # Process file if uploaded
         if file:
             # Validate file
-            validate_file_size(file)
-            validate_file_type(file)
-            
-            # Save file temporarily
-            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp:
-                shutil.copyfileobj(file.file, tmp)
-                temp_file_path = tmp.name
+            await validate_file_size(file)
+            await validate_file_type(file)
             
-            logger.info(f"Processing file: {file.filename} ({file.content_type})")
+            logger.info("Processing file: %s (%s)", file.filename, file.content_type)
             
             # Route to appropriate processor
-            if file.content_type.startswith('image/'):
-                file_info = await file_processor.process_image(temp_file_path)
-            elif file.content_type == 'application/pdf':
-                file_info = await file_processor.process_pdf(temp_file_path)
-            elif file.content_type.startswith('audio/'):
-                file_info = await file_processor.process_audio(temp_file_path)
-            else:
+            content_type = file.content_type or ''
+            handler_key = (
+                content_type if content_type in FILE_HANDLERS else content_type.split('/', 1)[0]
+            )
+            handler = FILE_HANDLERS.get(handler_key)
+            if handler is None:
                 raise HTTPException(
                     status_code=400,
                     detail=f"Unsupported file type: {file.content_type}"
                 )
             
+            if handler_key in DISK_BACKED_TYPES:
+                temp_file_path = await save_upload_to_temp(file)
+                file_info = await handler(temp_file_path)
+            else:
+                # Read straight from the upload's spooled file
+                await file.seek(0)
+                file_info = await handler(file.file)
+            
             # Handle processing errors
             if 'error' in file_info:
                 raise HTTPException(
@@ -137,12 +201,15 @@ async def process_request(
             if 'text' in file_info and file_info['text']:
                 content = f"{text}\n\n[Extracted Content]:\n{file_info['text']}"
             
-            logger.info(f"File processed successfully. Extracted {len(file_info.get('text', ''))} characters")
+            logger.info("File processed successfully. Extracted %s characters", len(file_info.get('text', '')))
         
-        # Check for YouTube URL
-        youtube_url = youtube_service.extract_url(text)
+        # Check for YouTube URL (same pattern the intent detector uses)
+        youtube_match = YOUTUBE_URL_RE.search(text)
+        youtube_url = (
+            f"https://www.youtube.com/watch?v={youtube_match.group(1)}" if youtube_match else None
+        )
         if youtube_url:
-            logger.info(f"YouTube URL detected: {youtube_url}")
+            logger.info("YouTube URL detected: %s", youtube_url)
             transcript = await youtube_service.get_transcript(youtube_url)
             if transcript:
                 content = f"{text}\n\n[YouTube Transcript]:\n{transcript}"
@@ -150,36 +217,54 @@ async def process_request(
         
         # Detect intent
         intent = intent_detector.detect(text, file is not None or youtube_url is not None)
-        logger.info(f"Detected intent: {intent}")
+        logger.info("Detected intent: %s", intent)
+        
+        # Stream the result as it is generated; file content is already extracted
+        if stream:
+            return StreamingResponse(
+                stream_events(intent, task_executor.stream(intent, content, text)),
+                media_type="text/event-stream"
+            )
         
         # Execute task based on intent
         result = await task_executor.execute(intent, content, text)
         
         # Prepare response
-        response = {
-            'success': True,
-            'intent': intent,
-            'extracted_content': file_info.get('text', '')[:500] if file_info.get('text') else '',
-            'result': result['result'],
-            'metadata': {
-                'file_type': file_info.get('type', 'text_only'),
-                'confidence': file_info.get('confidence'),
-                'pages': file_info.get('pages'),
-                'duration': file_info.get('duration'),
-                'language': file_info.get('language'),
-                'youtube': file_info.get('youtube', False)
+        if not file_info:
+            # Text-only request: nothing was extracted, so there is no file metadata
+            response = {
+                'success': True,
+                'intent': intent,
+                'extracted_content': '',
+                'result': result['result'],
+                'metadata': {'file_type': 'text_only'}
+            }
+        else:
+            extracted_text = file_info.get('text') or ''
+            response = {
+                'success': True,
+                'intent': intent,
+                'extracted_content': extracted_text[:500],
+                'result': result['result'],
+                'metadata': {
+                    'file_type': file_info.get('type', 'text_only'),
+                    'confidence': file_info.get('confidence'),
+                    'pages': file_info.get('pages'),
+                    'duration': file_info.get('duration'),
+                    'language': file_info.get('language'),
+                    'youtube': file_info.get('youtube', False)
+                }
             }
-        }
         
         logger.info("Request processed successfully")
         return response
         
     except HTTPException as e:
-        logger.error(f"HTTP error: {e.detail}")
+        logger.error("HTTP error: %s", e.detail)
         raise
     
     except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}", exc_info=True)
+        logger.error("Unexpected error: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Internal server error: {str(e)}"
@@ -190,9 +275,9 @@ async def process_request(
         if temp_file_path and os.path.exists(temp_file_path):
             try:
                 os.remove(temp_file_path)
-                logger.debug(f"Cleaned up temporary file: {temp_file_path}")
+                logger.debug("Cleaned up temporary file: %s", temp_file_path)
             except Exception as e:
-                logger.warning(f"Failed to cleanup temp file: {e}")
+                logger.warning("Failed to cleanup temp file: %s", e)
 
 @app.post("/api/estimate-cost")
 async def estimate_cost(
@@ -235,4 +320,16 @@ async def estimate_cost(
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    
+    # Multiple workers require the app as an import string.
+    # In production prefer: gunicorn main:app -k uvicorn.workers.UvicornWorker -w N
+    uvicorn.run(
+        "main:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8000")),
+        loop="uvloop",
+        http="httptools",
+        workers=WEB_WORKERS,
+        log_level="warning",
+        access_log=False
+    )
\ No newline at end of file
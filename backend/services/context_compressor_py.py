@@ -0,0 +1,196 @@
+"""
+Context Compressor
+Shrinks long transcripts before they are sent to the main model
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import re
+from typing import Awaitable, Callable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+COMPRESS_MAX_TOKENS = int(os.getenv("COMPRESS_MAX_TOKENS", "8000"))
+COMPRESS_CHUNK_TOKENS = 4000
+COMPRESS_SUMMARY_TOKENS = 800
+COMPRESSOR_MODEL = os.getenv("COMPRESSOR_MODEL", "claude-3-5-haiku-20241022")
+# Rate limits are per model, so the compressor model gets its own account-wide budget
+COMPRESSOR_RPM = float(os.getenv("COMPRESSOR_RPM", "50"))
+COMPRESSOR_TPM = float(os.getenv("COMPRESSOR_TPM", "50000"))
+
+COMPRESS_PROMPT = (
+    "Summarize this part of a video transcript, preserving key facts, names, numbers "
+    "and notable quotes. Reply with the summary only.\n\n"
+)
+
+# Verbal filler and caption annotations that carry no content
+_FILLER_RE = re.compile(
+    r'\[(?:music|applause|laughter|inaudible)\]|\b(?:uh+|um+|uhm|erm|hmm+|you know)\b,?',
+    re.IGNORECASE
+)
+# The same word said two or more times in a row ("the the")
+_REPEATED_WORD_RE = re.compile(r'\b(\w+)(?:\s+\1\b)+', re.IGNORECASE)
+_SPACES_RE = re.compile(r'[ \t]{2,}')
+# Sentence or paragraph boundaries to cut chunks at
+_BOUNDARY_RE = re.compile(r'(?<=[.!?])\s+|\n\s*\n')
+
+
+@functools.lru_cache(maxsize=None)
+def _get_encoding():
+    """tiktoken encoding, or None when tiktoken isn't installed"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except ImportError:
+        logger.warning("tiktoken not available, estimating tokens as characters/4")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Approximate token count (cl100k_base is close to, not equal to, Claude's tokenizer)"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """Cut text to at most budget tokens (by the same approximation as count_tokens)"""
+    # A token covers at least one byte, so short texts can skip tokenizing
+    if len(text.encode()) <= budget:
+        return text
+    
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:budget * 4]
+    
+    # Tokens average well under 8 characters, so this cut keeps at least budget
+    # tokens while sparing the tokenizer (which runs on the event loop) huge inputs
+    text = text[:budget * 8]
+    ids = encoding.encode(text, disallowed_special=())
+    if len(ids) <= budget:
+        return text
+    logger.warning("Truncating content from %s to %s tokens", len(ids), budget)
+    return encoding.decode(ids[:budget])
+
+
+def remove_filler(text: str) -> str:
+    """Drop filler words, caption annotations and immediate word repeats"""
+    text = _FILLER_RE.sub('', text)
+    text = _REPEATED_WORD_RE.sub(r'\1', text)
+    return _SPACES_RE.sub(' ', text).strip()
+
+
+def split_chunks(text: str, chunk_tokens: int = COMPRESS_CHUNK_TOKENS) -> List[str]:
+    """
+    Split text into chunks of about chunk_tokens, cutting at sentence or paragraph ends
+    
+    Auto-generated captions often have no punctuation, so overlong pieces are
+    cut by words instead
+    """
+    # (piece, token count) pairs, so no piece is tokenized twice
+    pieces = []
+    for piece in _BOUNDARY_RE.split(text):
+        tokens = count_tokens(piece)
+        if tokens <= chunk_tokens:
+            pieces.append((piece, tokens))
+            continue
+        words = piece.split()
+        # Use the piece's own token density to size word windows
+        step = max(1, len(words) * chunk_tokens // tokens)
+        for i in range(0, len(words), step):
+            window = " ".join(words[i:i + step])
+            pieces.append((window, count_tokens(window)))
+    
+    chunks, current, current_tokens = [], [], 0
+    for piece, tokens in pieces:
+        if current and current_tokens + tokens > chunk_tokens:
+            chunks.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+class ContextCompressor:
+    """
+    Compresses text that exceeds a token budget
+    
+    Filler is stripped locally first; if the text is still too long, each
+    chunk is summarized by a smaller, cheaper model and the summaries are
+    joined in order
+    """
+    
+    def __init__(
+        self,
+        create: Callable[..., Awaitable],
+        model: str = COMPRESSOR_MODEL,
+        max_tokens: int = COMPRESS_MAX_TOKENS,
+        chunk_tokens: int = COMPRESS_CHUNK_TOKENS
+    ):
+        """
+        Args:
+            create: Coroutine taking messages.create keyword arguments
+            model: Model used to summarize chunks
+            max_tokens: Texts at or under this many tokens are returned as-is
+            chunk_tokens: Target size of each summarized chunk
+        """
+        self.create = create
+        self.model = model
+        self.max_tokens = max_tokens
+        self.chunk_tokens = chunk_tokens
+    
+    async def compress(self, text: str) -> str:
+        """
+        Return text, shortened to roughly max_tokens if it is longer
+        
+        Falls back to the filler-stripped text if chunk summaries fail
+        """
+        # Tokenizing a long transcript takes a while, so it stays off the event loop
+        text, original_tokens, chunks = await asyncio.to_thread(self._prepare, text)
+        if not chunks:
+            return text
+        
+        try:
+            summaries = await asyncio.gather(*(self._summarize(chunk) for chunk in chunks))
+        except Exception as e:
+            logger.warning("Context compression failed, using full text: %s", e)
+            return text
+        
+        compressed = "\n\n".join(summaries)
+        logger.info(
+            "Compressed %s tokens to %s across %s chunks",
+            original_tokens, count_tokens(compressed), len(chunks)
+        )
+        return compressed
+    
+    def _prepare(self, text: str) -> Tuple[str, int, List[str]]:
+        """
+        Strip filler and split text into chunks, locally and synchronously
+        
+        Returns:
+            The (possibly stripped) text, its token count, and the chunks to
+            summarize, which are empty when the text already fits
+        """
+        tokens = count_tokens(text)
+        if tokens <= self.max_tokens:
+            return text, tokens, []
+        
+        text = remove_filler(text)
+        tokens = count_tokens(text)
+        if tokens <= self.max_tokens:
+            return text, tokens, []
+        
+        return text, tokens, split_chunks(text, self.chunk_tokens)
+    
+    async def _summarize(self, chunk: str) -> str:
+        response = await self.create(
+            model=self.model,
+            max_tokens=COMPRESS_SUMMARY_TOKENS,
+            messages=[{"role": "user", "content": COMPRESS_PROMPT + chunk}]
+        )
+        return response.content[0].text
@@ -3,14 +3,90 @@ File Processing Service
 Handles OCR, PDF parsing, and audio transcription
 """
 
+import asyncio
+import functools
+import importlib.util
 import logging
-from typing import Dict, Optional
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import BinaryIO, Dict, List, Optional, Union
 from PIL import Image
 import PyPDF2
 import io
+from utils.config import WEB_WORKERS
 
 logger = logging.getLogger(__name__)
 
+# A file on disk or an already-open binary file object (e.g. an upload's spooled file)
+FileSource = Union[str, BinaryIO]
+
+# Images larger than this (in either dimension) are downscaled before OCR
+OCR_MAX_DIMENSION = 2000
+
+# PDFs with at least this many pages have their text extracted in parallel
+PARALLEL_PDF_MIN_PAGES = 8
+
+# Leading pages checked for font resources before deciding a PDF is scanned
+PDF_FONT_PROBE_PAGES = 3
+
+# A page with more extracted characters than this proves the PDF has a text layer
+PDF_TEXT_PAGE_MIN_CHARS = 200
+
+# Every web worker process builds its own pools, so by default the cores are split
+# between the WEB_CONCURRENCY workers; FILE_PROCESSOR_WORKERS overrides the per-process size
+_CPU_WORKERS = int(os.getenv("FILE_PROCESSOR_WORKERS", "0")) or max(1, (os.cpu_count() or 1) // WEB_WORKERS)
+
+# Shared process pool for CPU-bound extraction work
+_CPU_POOL = ProcessPoolExecutor(max_workers=_CPU_WORKERS)
+
+# Shared thread pool for OCR; each call spawns a tesseract subprocess
+_OCR_POOL = ThreadPoolExecutor(max_workers=_CPU_WORKERS, thread_name_prefix="ocr")
+
+# Whisper model size (tiny, base, small, medium, large) and CTranslate2 settings
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+WHISPER_DEVICE = os.getenv("WHISPER_DEVICE", "auto")
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
+
+
+def _extract_page_range(pdf_bytes: bytes, start: int, stop: int) -> List[str]:
+    """
+    Extract text from pages [start, stop) of a PDF
+    
+    Runs in a worker process, so it takes raw bytes and parses the PDF itself
+    """
+    reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+@functools.lru_cache(maxsize=None)
+def _load_whisper_model(name: str):
+    """
+    Load a faster-whisper (CTranslate2) model once per process
+    
+    Cached at module level so every FileProcessor instance shares the same weights
+    """
+    from faster_whisper import WhisperModel
+    
+    logger.info("Loading Whisper model '%s' (%s)...", name, WHISPER_COMPUTE_TYPE)
+    return WhisperModel(name, device=WHISPER_DEVICE, compute_type=WHISPER_COMPUTE_TYPE)
+
+
+def _transcribe_audio(model, file_path: str) -> Dict:
+    """
+    Transcribe audio with greedy decoding
+    
+    faster-whisper yields segments lazily, so they are consumed here to keep
+    the actual decoding inside the calling worker thread
+    """
+    segments, info = model.transcribe(file_path, beam_size=1)
+    text = "".join(segment.text for segment in segments)
+    return {
+        'text': text,
+        'language': info.language,
+        'duration': info.duration
+    }
+
 
 class FileProcessor:
     """
@@ -21,38 +97,63 @@ class FileProcessor:
     """
     
     def __init__(self):
+        # Whisper is loaded on the first audio request, not at startup
+        self._whisper_model = None
+        self._whisper_lock: Optional[asyncio.Lock] = None
         self._check_dependencies()
     
     def _check_dependencies(self):
-        """Check if required libraries are available"""
-        try:
-            import pytesseract
+        """
+        Check if required libraries are available
+        
+        Only looks the packages up; the heavy imports happen on first use
+        """
+        if importlib.util.find_spec("pytesseract") is not None:
             self.ocr_available = True
             logger.info("Tesseract OCR is available")
-        except ImportError:
+        else:
             self.ocr_available = False
             logger.warning("Tesseract OCR not available. Install with: pip install pytesseract")
         
-        try:
-            import whisper
+        if importlib.util.find_spec("faster_whisper") is not None:
             self.whisper_available = True
             logger.info("Whisper is available")
-        except ImportError:
+        else:
             self.whisper_available = False
-            logger.warning("Whisper not available. Install with: pip install openai-whisper")
+            logger.warning("Whisper not available. Install with: pip install faster-whisper")
+    
+    async def _get_whisper_model(self):
+        """Load the Whisper model on first use and reuse it afterwards"""
+        if self._whisper_model is None:
+            # Created lazily so the lock binds to the running event loop
+            if self._whisper_lock is None:
+                self._whisper_lock = asyncio.Lock()
+            
+            async with self._whisper_lock:
+                if self._whisper_model is None:
+                    self._whisper_model = await asyncio.to_thread(_load_whisper_model, WHISPER_MODEL)
+        
+        return self._whisper_model
     
-    async def process_image(self, file_path: str) -> Dict:
+    @staticmethod
+    def _source_name(source: FileSource) -> str:
+        """Readable name of a file source for logging"""
+        if isinstance(source, str):
+            return source
+        return getattr(source, 'name', None) or '<in-memory file>'
+    
+    async def process_image(self, source: FileSource) -> Dict:
         """
         Extract text from image using OCR
         
         Args:
-            file_path: Path to image file
+            source: Path to image file or binary file object
         
         Returns:
             Dict with extracted text and metadata
         """
         try:
-            logger.info(f"Processing image: {file_path}")
+            logger.info("Processing image: %s", self._source_name(source))
             
             if not self.ocr_available:
                 return {
@@ -62,117 +163,318 @@ class FileProcessor:
             import pytesseract
             
             # Open and process image
-            img = Image.open(file_path)
+            img = Image.open(source)
+            dimensions = img.size
             
-            # Convert RGBA to RGB if needed
-            if img.mode == 'RGBA':
-                img = img.convert('RGB')
+            # Image decoding and OCR block, so they run on the OCR pool instead of the event loop
+            loop = asyncio.get_running_loop()
+            img = await loop.run_in_executor(_OCR_POOL, self._prepare_for_ocr, img)
             
-            # Perform OCR
-            text = pytesseract.image_to_string(img)
+            # Perform OCR once; text and confidence both come from the word-level data
+            data = await loop.run_in_executor(
+                _OCR_POOL,
+                functools.partial(pytesseract.image_to_data, img, output_type=pytesseract.Output.DICT)
+            )
+            text = self._text_from_ocr_data(data)
             
-            # Get OCR data for confidence calculation
-            try:
-                data = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT)
-                confidences = [int(conf) for conf in data['conf'] if conf != '-1']
-                avg_confidence = sum(confidences) / len(confidences) if confidences else 0
-            except:
-                avg_confidence = 0
+            confidences = [float(conf) for conf in data['conf'] if float(conf) >= 0]
+            avg_confidence = sum(confidences) / len(confidences) if confidences else 0
             
-            logger.info(f"OCR completed. Extracted {len(text)} characters with {avg_confidence:.1f}% confidence")
+            logger.info("OCR completed. Extracted %s characters with %.1f%% confidence", len(text), avg_confidence)
             
             return {
                 'text': text.strip(),
                 'confidence': round(avg_confidence, 2),
                 'type': 'image_ocr',
-                'dimensions': img.size
+                'dimensions': dimensions
             }
         
         except Exception as e:
-            logger.error(f"Error processing image: {str(e)}", exc_info=True)
+            logger.error("Error processing image: %s", e, exc_info=True)
             return {'error': f"Image processing failed: {str(e)}"}
     
-    async def process_pdf(self, file_path: str) -> Dict:
+    @staticmethod
+    def _text_from_ocr_data(data: Dict) -> str:
+        """
+        Rebuild plain text from pytesseract.image_to_data output
+        
+        Words on the same line are joined with spaces, lines with newlines and
+        paragraphs with a blank line, mirroring image_to_string's layout.
+        """
+        paragraphs = []
+        current_paragraph = None
+        current_line = None
+        
+        for block, par, line, word in zip(
+            data['block_num'], data['par_num'], data['line_num'], data['text']
+        ):
+            if not word or not word.strip():
+                continue
+            
+            if (block, par) != current_paragraph:
+                current_paragraph = (block, par)
+                current_line = None
+                paragraphs.append([])
+            
+            if line != current_line:
+                current_line = line
+                paragraphs[-1].append([])
+            
+            paragraphs[-1][-1].append(word)
+        
+        return "\n\n".join(
+            "\n".join(" ".join(words) for words in lines) for lines in paragraphs
+        )
+    
+    def _prepare_for_ocr(self, img: Image.Image) -> Image.Image:
+        """
+        Shrink, greyscale and binarize an image before OCR
+        
+        Tesseract's runtime grows with pixel count, and phone photos are far
+        larger than it needs for accurate recognition.
+        """
+        if max(img.size) > OCR_MAX_DIMENSION:
+            img.thumbnail((OCR_MAX_DIMENSION, OCR_MAX_DIMENSION), Image.LANCZOS)
+        
+        gray = img.convert('L')
+        threshold = self._otsu_threshold(gray.histogram())
+        return gray.point([0 if level <= threshold else 255 for level in range(256)])
+    
+    @staticmethod
+    def _otsu_threshold(histogram: List[int]) -> int:
+        """
+        Find the grey level that best separates foreground from background (Otsu's method)
+        
+        Args:
+            histogram: 256-bin greyscale histogram
+        
+        Returns:
+            Threshold level; pixels at or below it are treated as foreground
+        """
+        total = sum(histogram)
+        weighted_total = sum(level * count for level, count in enumerate(histogram))
+        
+        background_weight = 0
+        background_sum = 0
+        best_threshold = 0
+        best_variance = 0.0
+        
+        for level, count in enumerate(histogram):
+            background_weight += count
+            if background_weight == 0:
+                continue
+            
+            foreground_weight = total - background_weight
+            if foreground_weight == 0:
+                break
+            
+            background_sum += level * count
+            background_mean = background_sum / background_weight
+            foreground_mean = (weighted_total - background_sum) / foreground_weight
+            
+            # Between-class variance
+            variance = background_weight * foreground_weight * (background_mean - foreground_mean) ** 2
+            if variance > best_variance:
+                best_variance = variance
+                best_threshold = level
+        
+        return best_threshold
+    
+    async def process_pdf(self, source: FileSource) -> Dict:
         """
         Extract text from PDF with OCR fallback for scanned PDFs
         
         Args:
-            file_path: Path to PDF file
+            source: Path to PDF file or binary file object
         
         Returns:
             Dict with extracted text and metadata
         """
         try:
-            logger.info(f"Processing PDF: {file_path}")
+            logger.info("Processing PDF: %s", self._source_name(source))
             
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                num_pages = len(pdf_reader.pages)
-                
-                text = ""
-                for page_num, page in enumerate(pdf_reader.pages):
-                    page_text = page.extract_text()
-                    text += page_text + "\n"
-                
-                # Check if meaningful text was extracted
-                if len(text.strip()) < 50:
-                    logger.warning("PDF appears to be scanned. Attempting OCR...")
-                    
-                    if self.ocr_available:
-                        # Convert PDF pages to images and OCR
-                        text = await self._ocr_pdf(file_path)
-                        return {
-                            'text': text.strip(),
-                            'pages': num_pages,
-                            'type': 'pdf_ocr',
-                            'method': 'ocr_fallback'
-                        }
-                    else:
-                        return {
-                            'text': text.strip(),
-                            'pages': num_pages,
-                            'type': 'pdf_text',
-                            'warning': 'Limited text extracted. OCR not available.'
-                        }
-                
-                logger.info(f"PDF processed. Extracted {len(text)} characters from {num_pages} pages")
-                
+            pdf_reader = await asyncio.to_thread(PyPDF2.PdfReader, source)
+            num_pages = len(pdf_reader.pages)
+            
+            # Scanned PDFs reference no fonts, so skip straight to OCR
+            if self.ocr_available and not await asyncio.to_thread(self._has_text_layer, pdf_reader):
+                logger.info("PDF has no font resources. Using OCR...")
+                text = await self._ocr_pdf(source)
                 return {
                     'text': text.strip(),
                     'pages': num_pages,
-                    'type': 'pdf_text',
-                    'method': 'text_extraction'
+                    'type': 'pdf_ocr',
+                    'method': 'ocr_no_text_layer'
                 }
+            
+            # Read pages until one proves the PDF has real text, then extract the rest
+            page_texts = await asyncio.to_thread(self._probe_pdf_text, pdf_reader)
+            start = len(page_texts)
+            if num_pages - start >= PARALLEL_PDF_MIN_PAGES:
+                page_texts.extend(await self._extract_pdf_text_parallel(source, start, num_pages))
+            elif start < num_pages:
+                page_texts.extend(await asyncio.to_thread(self._extract_pdf_text, pdf_reader, start))
+            
+            text = "\n".join(page_texts)
+            
+            # Check if meaningful text was extracted
+            if len(text.strip()) < 50:
+                logger.warning("PDF appears to be scanned. Attempting OCR...")
+                
+                if self.ocr_available:
+                    # Convert PDF pages to images and OCR
+                    text = await self._ocr_pdf(source)
+                    return {
+                        'text': text.strip(),
+                        'pages': num_pages,
+                        'type': 'pdf_ocr',
+                        'method': 'ocr_fallback'
+                    }
+                else:
+                    return {
+                        'text': text.strip(),
+                        'pages': num_pages,
+                        'type': 'pdf_text',
+                        'warning': 'Limited text extracted. OCR not available.'
+                    }
+            
+            logger.info("PDF processed. Extracted %s characters from %s pages", len(text), num_pages)
+            
+            return {
+                'text': text.strip(),
+                'pages': num_pages,
+                'type': 'pdf_text',
+                'method': 'text_extraction'
+            }
         
         except Exception as e:
-            logger.error(f"Error processing PDF: {str(e)}", exc_info=True)
+            logger.error("Error processing PDF: %s", e, exc_info=True)
             return {'error': f"PDF processing failed: {str(e)}"}
     
-    async def _ocr_pdf(self, file_path: str) -> str:
+    @staticmethod
+    def _has_text_layer(pdf_reader: PyPDF2.PdfReader) -> bool:
+        """
+        Check whether any of the first pages references a font
+        
+        Text can only be drawn with a font, so a PDF whose sampled pages have no
+        /Font resources (directly or in form XObjects) is a scanned image.
+        """
+        for index in range(min(PDF_FONT_PROBE_PAGES, len(pdf_reader.pages))):
+            page = pdf_reader.pages[index]
+            if '/Resources' not in page:
+                continue
+            
+            resources = page['/Resources']
+            if '/Font' in resources:
+                return True
+            
+            if '/XObject' in resources:
+                for xobject in resources['/XObject'].values():
+                    xobject = xobject.get_object()
+                    if (
+                        xobject.get('/Subtype') == '/Form'
+                        and '/Resources' in xobject
+                        and '/Font' in xobject['/Resources']
+                    ):
+                        return True
+        
+        return False
+    
+    @staticmethod
+    def _probe_pdf_text(pdf_reader: PyPDF2.PdfReader) -> List[str]:
+        """Extract pages in order, stopping at the first page with substantial text"""
+        page_texts = []
+        for page in pdf_reader.pages:
+            page_text = page.extract_text() or ""
+            page_texts.append(page_text)
+            if len(page_text) > PDF_TEXT_PAGE_MIN_CHARS:
+                break
+        return page_texts
+    
+    @staticmethod
+    def _extract_pdf_text(pdf_reader: PyPDF2.PdfReader, start: int = 0) -> List[str]:
+        """Extract text from every page of an already-parsed PDF, from page start onwards"""
+        return [
+            pdf_reader.pages[index].extract_text() or ""
+            for index in range(start, len(pdf_reader.pages))
+        ]
+    
+    async def _extract_pdf_text_parallel(
+        self,
+        source: FileSource,
+        start: int,
+        stop: int
+    ) -> List[str]:
+        """
+        Extract text from pages [start, stop) across the shared process pool
+        
+        Pages are split into one contiguous range per worker so each worker
+        parses the PDF only once.
+        """
+        if isinstance(source, str):
+            with open(source, 'rb') as file:
+                pdf_bytes = file.read()
+        else:
+            source.seek(0)
+            pdf_bytes = source.read()
+        
+        num_pages = stop - start
+        workers = min(_CPU_WORKERS, num_pages)
+        bounds = [
+            (start + num_pages * i // workers, start + num_pages * (i + 1) // workers)
+            for i in range(workers)
+        ]
+        logger.info("Extracting %s PDF pages across %s workers", num_pages, workers)
+        
+        loop = asyncio.get_running_loop()
+        chunks = await asyncio.gather(*[
+            loop.run_in_executor(_CPU_POOL, _extract_page_range, pdf_bytes, range_start, range_stop)
+            for range_start, range_stop in bounds
+        ])
+        return [page_text for chunk in chunks for page_text in chunk]
+    
+    async def _ocr_pdf(self, source: FileSource) -> str:
         """
         Fallback OCR for scanned PDFs
         Requires pdf2image library
         """
         try:
-            from pdf2image import convert_from_path
+            from pdf2image import convert_from_bytes, convert_from_path
             import pytesseract
             
             logger.info("Converting PDF to images for OCR...")
-            images = convert_from_path(file_path, dpi=300)
             
-            text = ""
-            for i, img in enumerate(images):
-                logger.info(f"OCR on page {i+1}/{len(images)}")
-                page_text = pytesseract.image_to_string(img)
-                text += page_text + "\n\n"
+            # Render pages to disk instead of holding every page image in memory;
+            # PNG rather than the default PPM, which is ~25MB per page at 300 DPI
+            with tempfile.TemporaryDirectory() as output_folder:
+                options = {
+                    'dpi': 300,
+                    'fmt': 'png',
+                    'thread_count': _CPU_WORKERS,
+                    'output_folder': output_folder,
+                    'paths_only': True
+                }
+                if isinstance(source, str):
+                    page_paths = await asyncio.to_thread(convert_from_path, source, **options)
+                else:
+                    source.seek(0)
+                    page_paths = await asyncio.to_thread(convert_from_bytes, source.read(), **options)
+                
+                # Tesseract runs as a subprocess, so threads OCR pages concurrently
+                logger.info("Running OCR on %s pages", len(page_paths))
+                loop = asyncio.get_running_loop()
+                page_texts = await asyncio.gather(*[
+                    loop.run_in_executor(_OCR_POOL, pytesseract.image_to_string, page_path)
+                    for page_path in page_paths
+                ])
             
-            return text
+            return "\n\n".join(page_texts)
         
         except ImportError:
             logger.error("pdf2image not available for OCR fallback")
             return "[OCR not available for scanned PDFs. Install: pip install pdf2image]"
         except Exception as e:
-            logger.error(f"OCR fallback failed: {str(e)}")
+            logger.error("OCR fallback failed: %s", e)
             return f"[OCR failed: {str(e)}]"
     
     async def process_audio(self, file_path: str) -> Dict:
@@ -186,26 +488,21 @@ class FileProcessor:
             Dict with transcription and metadata
         """
         try:
-            logger.info(f"Processing audio: {file_path}")
+            logger.info("Processing audio: %s", file_path)
             
             if not self.whisper_available:
                 return {
-                    'text': '[Audio transcription requires Whisper. Install: pip install openai-whisper]',
+                    'text': '[Audio transcription requires Whisper. Install: pip install faster-whisper]',
                     'type': 'audio_transcription',
                     'error': 'Whisper not available'
                 }
             
-            import whisper
-            
-            # Load Whisper model (base model for balance of speed/accuracy)
-            logger.info("Loading Whisper model...")
-            model = whisper.load_model("base")
+            model = await self._get_whisper_model()
             
-            # Transcribe
             logger.info("Transcribing audio...")
-            result = model.transcribe(file_path)
+            result = await asyncio.to_thread(_transcribe_audio, model, file_path)
             
-            logger.info(f"Audio transcribed. Duration: {result.get('duration', 0):.1f}s, Language: {result.get('language', 'unknown')}")
+            logger.info("Audio transcribed. Duration: %.1fs, Language: %s", result.get('duration', 0), result.get('language', 'unknown'))
             
             return {
                 'text': result['text'].strip(),
@@ -215,7 +512,7 @@ class FileProcessor:
             }
         
         except Exception as e:
-            logger.error(f"Error processing audio: {str(e)}", exc_info=True)
+            logger.error("Error processing audio: %s", e, exc_info=True)
             return {
                 'text': f'[Audio transcription failed: {str(e)}]',
                 'error': str(e),
@@ -236,12 +533,12 @@ class FileProcessor:
         import os
         
         if not os.path.exists(file_path):
-            logger.error(f"File not found: {file_path}")
+            logger.error("File not found: %s", file_path)
             return False
         
         file_size = os.path.getsize(file_path)
         if file_size == 0:
-            logger.error(f"File is empty: {file_path}")
+            logger.error("File is empty: %s", file_path)
             return False
         
         # Basic type checking based on extension
@@ -254,7 +551,7 @@ class FileProcessor:
         }
         
         if ext not in type_extensions.get(expected_type, []):
-            logger.warning(f"Unexpected file extension {ext} for type {expected_type}")
+            logger.warning("Unexpected file extension %s for type %s", ext, expected_type)
             return False
         
         return True
\ No newline at end of file
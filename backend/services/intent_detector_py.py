@@ -4,11 +4,40 @@ Analyzes user input to determine the appropriate task
 """
 
 import re
-from typing import Dict, List
+import functools
+from typing import Dict, FrozenSet, List, Optional, Set
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Number of distinct (text, has_file) inputs whose intent is memoized
+DETECT_CACHE_SIZE = 1024
+
+# YouTube watch, short or embed URL; group 1 is the 11-character video ID
+YOUTUBE_URL_RE = re.compile(
+    r'(?:https?://)?(?:www\.)?(?:youtube\.com/(?:watch\?v=|embed/)|youtu\.be/)([A-Za-z0-9_-]{11})'
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_hyperscan_database(patterns: tuple):
+    """
+    Compile regex patterns into one Hyperscan database
+    
+    Unicode-aware compilation is slow, so the database is built once per process
+    and shared by every IntentDetector instance.
+    """
+    import hyperscan
+    
+    flags = hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP
+    database = hyperscan.Database()
+    database.compile(
+        expressions=[pattern.encode() for pattern in patterns],
+        ids=list(range(len(patterns))),
+        flags=[flags] * len(patterns)
+    )
+    return database
+
 
 class IntentDetector:
     """
@@ -42,9 +71,6 @@ class IntentDetector:
         'action_items': [
             'action item', 'action items', 'todo', 'to-do', 'task',
             'tasks', 'next steps', 'follow up', 'deliverable'
-        ],
-        'youtube_transcript': [
-            'youtube.com', 'youtu.be', 'youtube', 'video transcript'
         ]
     }
     
@@ -63,8 +89,69 @@ class IntentDetector:
         r'```[\s\S]*?```',  # Code blocks
     ]
     
+    EXPLANATION_WORDS = (
+        'explain', 'what does', 'how does', 'what is',
+        'analyze', 'review', 'understand', 'clarify'
+    )
+    
+    ACTION_VERBS = (
+        'summarize', 'explain', 'analyze', 'extract',
+        'find', 'list', 'show', 'tell', 'give',
+        'identify', 'detect', 'calculate', 'convert'
+    )
+    
+    _WHITESPACE_RE = re.compile(r'\s+')
+    _WORD_RE = re.compile(r'\w+')
+    
     def __init__(self):
-        self.compiled_patterns = [re.compile(pattern) for pattern in self.CODE_PATTERNS]
+        # All code patterns in one alternation, so the fallback scan is a single search
+        self.code_pattern = re.compile('|'.join(f'(?:{pattern})' for pattern in self.CODE_PATTERNS))
+        
+        # Single-word keywords are matched against the start of the input's words, so
+        # inflections ("summarized", "todos") count but "stone" doesn't match "tone";
+        # only phrases (spaces or punctuation) still need a substring scan
+        self.keyword_tokens: Dict[str, FrozenSet[str]] = {
+            intent: frozenset(keyword for keyword in keywords if self._WORD_RE.fullmatch(keyword))
+            for intent, keywords in self.INTENT_KEYWORDS.items()
+        }
+        self.keyword_phrases: Dict[str, List[str]] = {
+            intent: [keyword for keyword in keywords if not self._WORD_RE.fullmatch(keyword)]
+            for intent, keywords in self.INTENT_KEYWORDS.items()
+        }
+        all_keyword_tokens = sorted(frozenset().union(*self.keyword_tokens.values()), key=len, reverse=True)
+        # One scan for every intent; group 1 is the keyword a word starts with
+        self._keyword_token_re = re.compile(r'\b(' + '|'.join(map(re.escape, all_keyword_tokens)) + r')\w*')
+        
+        # One alternation per intent so the fallback phrase scan is a single C-level search
+        self.keyword_patterns = {
+            intent: re.compile('|'.join(re.escape(phrase) for phrase in phrases))
+            for intent, phrases in self.keyword_phrases.items()
+            if phrases
+        }
+        self._code_database = self._build_code_database()
+        # Detection is a pure function of its inputs, so repeated prompts are memoized
+        self._detect_cached = functools.lru_cache(maxsize=DETECT_CACHE_SIZE)(self._detect_impl)
+        self._keyword_automaton = self._build_keyword_automaton()
+    
+    def _build_keyword_automaton(self):
+        """
+        Compile every multi-word keyword phrase into a single Aho-Corasick automaton
+        
+        Returns:
+            Automaton mapping phrase -> (intent, phrase), or None if pyahocorasick is missing
+        """
+        try:
+            import ahocorasick
+        except ImportError:
+            logger.info("pyahocorasick not available, falling back to per-intent keyword scan")
+            return None
+        
+        automaton = ahocorasick.Automaton()
+        for intent, phrases in self.keyword_phrases.items():
+            for phrase in phrases:
+                automaton.add_word(phrase, (intent, phrase))
+        automaton.make_automaton()
+        return automaton
     
     def detect(self, text: str, has_file: bool) -> str:
         """
@@ -77,16 +164,36 @@ class IntentDetector:
         Returns:
             Detected intent as string
         """
-        if not text:
-            text = ""
-        
-        text_lower = text.lower().strip()
+        return self._detect_cached(self._normalize(text), has_file)
+    
+    def _normalize(self, text: Optional[str]) -> str:
+        """
+        Canonicalize whitespace so equivalent prompts share one cache entry
         
+        Case is preserved because code patterns are case-sensitive
+        """
+        if not text:
+            return ""
+        return self._WHITESPACE_RE.sub(' ', text).strip()
+    
+    def cache_info(self):
+        """Return hit/miss statistics of the detection cache"""
+        return self._detect_cached.cache_info()
+    
+    def cache_clear(self) -> None:
+        """Drop all memoized detection results"""
+        self._detect_cached.cache_clear()
+    
+    def _detect_impl(self, text: str, has_file: bool) -> str:
+        """Uncached intent detection on whitespace-normalized text"""
         # Check for YouTube URL first
-        if self._contains_keywords(text_lower, 'youtube_transcript'):
+        if YOUTUBE_URL_RE.search(text):
             logger.info("Intent: YouTube transcript detected")
             return 'youtube_transcript'
         
+        text_lower = text.lower()
+        matched_intents = self._matched_intents(text_lower)
+        
         # Check for code patterns
         if self._contains_code(text):
             if self._contains_explanation_request(text_lower):
@@ -94,12 +201,9 @@ class IntentDetector:
                 return 'code_explanation'
         
         # Check explicit intents with high confidence
-        for intent, keywords in self.INTENT_KEYWORDS.items():
-            if intent == 'youtube_transcript':
-                continue  # Already checked
-            
-            if self._contains_keywords(text_lower, intent):
-                logger.info(f"Intent: {intent} detected via keywords")
+        for intent in self.INTENT_KEYWORDS:
+            if intent in matched_intents:
+                logger.info("Intent: %s detected via keywords", intent)
                 return intent
         
         # If file is present but no clear instruction
@@ -111,56 +215,96 @@ class IntentDetector:
         logger.info("Intent: Conversational (default)")
         return 'conversational'
     
-    def _contains_keywords(self, text: str, intent: str) -> bool:
-        """Check if text contains keywords for specific intent"""
-        keywords = self.INTENT_KEYWORDS.get(intent, [])
-        return any(keyword in text for keyword in keywords)
+    def _build_code_database(self):
+        """
+        Compile all CODE_PATTERNS into a single Hyperscan database
+        
+        Returns:
+            Hyperscan database, or None if hyperscan is missing
+        """
+        try:
+            return _compile_hyperscan_database(tuple(self.CODE_PATTERNS))
+        except ImportError:
+            logger.info("hyperscan not available, falling back to regex code scan")
+            return None
+    
+    def _matched_intents(self, text: str) -> Set[str]:
+        """Return every intent with at least one keyword in text"""
+        matched = set()
+        
+        found = frozenset(self._keyword_token_re.findall(text))
+        if found:
+            matched.update(
+                intent for intent, keywords in self.keyword_tokens.items()
+                if not found.isdisjoint(keywords)
+            )
+        
+        if self._keyword_automaton is not None:
+            matched.update(intent for _, (intent, _) in self._keyword_automaton.iter(text))
+        else:
+            matched.update(
+                intent for intent, pattern in self.keyword_patterns.items()
+                if pattern.search(text)
+            )
+        
+        return matched
     
     def _contains_code(self, text: str) -> bool:
         """Check if text contains code patterns"""
-        return any(pattern.search(text) for pattern in self.compiled_patterns)
+        if self._code_database is not None:
+            import hyperscan
+            
+            # Returning True from the handler stops the scan at the first match
+            try:
+                self._code_database.scan(text.encode(), match_event_handler=lambda *_: True)
+            except hyperscan.ScanTerminated:
+                return True
+            return False
+        
+        return self.code_pattern.search(text) is not None
     
     def _contains_explanation_request(self, text: str) -> bool:
-        """Check if text requests explanation"""
-        explanation_words = [
-            'explain', 'what does', 'how does', 'what is',
-            'analyze', 'review', 'understand', 'clarify'
-        ]
-        return any(word in text for word in explanation_words)
+        """Check if already-lowercased text requests explanation"""
+        return any(word in text for word in self.EXPLANATION_WORDS)
     
     def _has_clear_instruction(self, text: str) -> bool:
         """
-        Check if text contains clear action verbs/instructions
+        Check if already-lowercased text contains clear action verbs/instructions
         
         Returns True if user clearly states what they want
         """
         if not text or len(text) < 5:
             return False
         
-        action_verbs = [
-            'summarize', 'explain', 'analyze', 'extract',
-            'find', 'list', 'show', 'tell', 'give',
-            'identify', 'detect', 'calculate', 'convert'
-        ]
-        
-        return any(verb in text for verb in action_verbs)
+        return any(verb in text for verb in self.ACTION_VERBS)
     
-    def get_confidence(self, text: str, has_file: bool) -> float:
+    def get_confidence(self, text: str, has_file: bool, intent: Optional[str] = None) -> float:
         """
         Calculate confidence score for detected intent
         
+        Args:
+            text: User's input text
+            has_file: Whether a file was uploaded
+            intent: Intent already returned by detect(), to skip detecting it again
+        
         Returns:
             Confidence score between 0.0 and 1.0
         """
-        intent = self.detect(text, has_file)
+        if intent is None:
+            intent = self.detect(text, has_file)
         
         if intent == 'needs_clarification':
             return 0.0
         
-        text_lower = text.lower()
-        keyword_matches = sum(
-            1 for keyword in self.INTENT_KEYWORDS.get(intent, [])
-            if keyword in text_lower
+        # A YouTube URL is unambiguous
+        if intent == 'youtube_transcript':
+            return 0.95
+        
+        text_lower = self._normalize(text).lower()
+        found = frozenset(self._keyword_token_re.findall(text_lower))
+        keyword_matches = len(found & self.keyword_tokens.get(intent, frozenset())) + sum(
+            1 for phrase in self.keyword_phrases.get(intent, [])
+            if phrase in text_lower
         )
         
         if keyword_matches >= 2:
@@ -0,0 +1,115 @@
+"""
+LLM Response Cache
+Stores Claude task results keyed by a hash of the exact request
+"""
+
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, Optional, Protocol
+
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_MAXSIZE = int(os.getenv("LLM_CACHE_MAXSIZE", "10000"))
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "3600"))
+
+
+class CacheBackend(Protocol):
+    """Storage used by LLMCache; values are JSON strings"""
+    
+    async def get(self, key: str) -> Optional[str]: ...
+    
+    async def set(self, key: str, value: str, ttl: int) -> None: ...
+    
+    async def delete(self, key: str) -> None: ...
+
+
+class MemoryBackend:
+    """In-process TTL cache, local to each worker"""
+    
+    def __init__(self, maxsize: int = LLM_CACHE_MAXSIZE, ttl: int = LLM_CACHE_TTL):
+        self._store = TTLCache(maxsize=maxsize, ttl=ttl)
+    
+    async def get(self, key: str) -> Optional[str]:
+        return self._store.get(key)
+    
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        # TTLCache applies one TTL to every entry
+        self._store[key] = value
+    
+    async def delete(self, key: str) -> None:
+        self._store.pop(key, None)
+
+
+class RedisBackend:
+    """Redis-backed cache, shared by every worker"""
+    
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self._redis = redis.from_url(url, decode_responses=True)
+    
+    async def get(self, key: str) -> Optional[str]:
+        return await self._redis.get(key)
+    
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        await self._redis.set(key, value, ex=ttl)
+    
+    async def delete(self, key: str) -> None:
+        await self._redis.delete(key)
+
+
+def default_backend() -> CacheBackend:
+    """Use Redis when REDIS_URL is set and the client is installed, else memory"""
+    url = os.getenv("REDIS_URL")
+    if url:
+        try:
+            return RedisBackend(url)
+        except ImportError:
+            logger.warning("REDIS_URL is set but redis is not installed, using in-memory LLM cache")
+    return MemoryBackend()
+
+
+class LLMCache:
+    """
+    Exact-match cache for task results
+    
+    Errors are never stored, and a failing backend is treated as a miss
+    """
+    
+    def __init__(self, backend: Optional[CacheBackend] = None, ttl: int = LLM_CACHE_TTL):
+        self.backend = backend or default_backend()
+        self.ttl = ttl
+    
+    @staticmethod
+    def make_key(task_type: str, model: str, content: str, query: str) -> str:
+        """SHA-256 of everything that determines the response"""
+        payload = json.dumps(
+            {"t": task_type, "m": model, "c": content, "q": query},
+            sort_keys=True
+        )
+        return "llm:" + hashlib.sha256(payload.encode()).hexdigest()
+    
+    async def get(self, key: str) -> Optional[Dict]:
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            logger.warning("LLM cache read failed: %s", e)
+            return None
+        return json.loads(value) if value else None
+    
+    async def set(self, key: str, result: Dict) -> None:
+        if result.get('error'):
+            return
+        try:
+            await self.backend.set(key, json.dumps(result), self.ttl)
+        except Exception as e:
+            logger.warning("LLM cache write failed: %s", e)
+    
+    async def delete(self, key: str) -> None:
+        try:
+            await self.backend.delete(key)
+        except Exception as e:
+            logger.warning("LLM cache delete failed: %s", e)
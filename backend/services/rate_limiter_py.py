@@ -0,0 +1,135 @@
+"""
+Claude Rate Limiter
+Keeps request and token throughput under the account's per-minute limits
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Optional
+
+from anthropic import APIConnectionError, InternalServerError, RateLimitError
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+from utils.config import WEB_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Account-wide limits; every web worker process keeps its own buckets, so each
+# one is given an equal share of them
+CLAUDE_RPM = float(os.getenv("CLAUDE_RPM", "40"))
+CLAUDE_TPM = float(os.getenv("CLAUDE_TPM", "16000"))
+CLAUDE_MAX_CONCURRENCY = int(os.getenv("CLAUDE_MAX_CONCURRENCY", "50"))
+CLAUDE_MAX_RETRIES = int(os.getenv("CLAUDE_MAX_RETRIES", "5"))
+
+# Errors worth another attempt: 429s, 5xx/overloaded responses and connection failures.
+# The Anthropic client is built with max_retries=0 so these are retried here only
+RETRYABLE_ERRORS = (RateLimitError, InternalServerError, APIConnectionError)
+
+
+class TokenBucket:
+    """
+    Async token bucket refilled continuously at rate_per_minute
+    
+    Waiters are served in arrival order. A request larger than the bucket
+    waits for a full bucket and is then charged in full, leaving the bucket
+    in debt until the refill catches up, so the average rate still holds
+    """
+    
+    def __init__(
+        self,
+        rate_per_minute: float,
+        capacity: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity or rate_per_minute
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        # Created on first use so it binds to the running event loop (Python 3.9)
+        self._lock: Optional[asyncio.Lock] = None
+    
+    async def acquire(self, amount: float = 1) -> None:
+        # Waiting for more than the bucket holds would never end
+        needed = min(amount, self.capacity)
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= needed:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((needed - self._tokens) / self.rate)
+
+
+def estimate_tokens(messages: list) -> int:
+    """Rough input token count (~4 characters per token)"""
+    chars = 0
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, str):
+            chars += len(content)
+        else:
+            chars += sum(len(block.get("text", "")) for block in content)
+    return chars // 4 + 1
+
+
+class RateLimiter:
+    """
+    Request/token buckets plus a concurrency cap for Claude calls
+    
+    Limits apply to this process only; the defaults are the account-wide
+    CLAUDE_RPM/CLAUDE_TPM divided by WEB_CONCURRENCY. Calls that still fail
+    with a 429 or a transient error are retried with jittered exponential
+    backoff, taking fresh budget for each attempt.
+    """
+    
+    def __init__(
+        self,
+        rpm: float = CLAUDE_RPM / WEB_WORKERS,
+        tpm: float = CLAUDE_TPM / WEB_WORKERS,
+        max_concurrency: int = CLAUDE_MAX_CONCURRENCY,
+        max_retries: int = CLAUDE_MAX_RETRIES
+    ):
+        self.rpm = TokenBucket(rpm)
+        self.tpm = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self._sem: Optional[asyncio.Semaphore] = None
+    
+    @property
+    def concurrency(self) -> asyncio.Semaphore:
+        """Cap on in-flight calls, created lazily so it binds to the running event loop"""
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+        return self._sem
+    
+    async def acquire(self, messages: list) -> None:
+        """Wait for request and token budget for one attempt"""
+        await self.rpm.acquire(1)
+        await self.tpm.acquire(estimate_tokens(messages))
+    
+    @asynccontextmanager
+    async def slot(self, messages: list) -> AsyncIterator[None]:
+        """Wait for budget, then hold a concurrency slot for the call"""
+        await self.acquire(messages)
+        async with self.concurrency:
+            yield
+    
+    def retrying(self) -> AsyncRetrying:
+        """Retry policy for calls rejected with a rate limit or transient error"""
+        return AsyncRetrying(
+            retry=retry_if_exception_type(RETRYABLE_ERRORS),
+            wait=wait_exponential_jitter(initial=1, max=30),
+            stop=stop_after_attempt(self.max_retries),
+            before_sleep=lambda state: logger.warning(
+                "Claude call failed (%s), retry %s of %s",
+                state.outcome.exception(), state.attempt_number, self.max_retries
+            ),
+            reraise=True
+        )
@@ -3,12 +3,159 @@ Task Execution Service
 Routes tasks to appropriate handlers and executes them using Claude AI
 """
 
+import asyncio
+import functools
+import json
 import logging
-from typing import Dict
-from anthropic import Anthropic
+import os
+import re
+from typing import AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Union
+import httpx
+from anthropic import AsyncAnthropic
+from services.context_compressor import COMPRESSOR_RPM, COMPRESSOR_TPM, ContextCompressor, truncate_to_tokens
+from services.llm_cache import LLMCache
+from services.rate_limiter import RateLimiter
+from utils.config import WEB_WORKERS
 
 logger = logging.getLogger(__name__)
 
+# httpx logs every request at INFO
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+@functools.lru_cache(maxsize=None)
+def _shared_http_client() -> httpx.AsyncClient:
+    """Process-wide HTTP/2 pool so Anthropic calls reuse keep-alive connections"""
+    return httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=200, max_keepalive_connections=100, keepalive_expiry=60)
+    )
+
+
+@functools.lru_cache(maxsize=4)
+def _get_client(api_key: str) -> AsyncAnthropic:
+    """One Anthropic client per API key, all sharing the same connection pool"""
+    # Retries are handled by the rate limiter, which re-takes budget for each attempt
+    return AsyncAnthropic(api_key=api_key, http_client=_shared_http_client(), max_retries=0)
+
+
+async def close_clients() -> None:
+    """Close the shared connection pool; call once on application shutdown"""
+    if _shared_http_client.cache_info().currsize:
+        await _shared_http_client().aclose()
+    _get_client.cache_clear()
+    _shared_http_client.cache_clear()
+
+
+# Handlers return a result dict, or an iterator of text chunks when streaming
+HandlerResult = Union[Dict, AsyncIterator[str]]
+
+# Marks where the fetched transcript starts in YouTube request content
+YOUTUBE_TRANSCRIPT_MARKER = "[YouTube Transcript]:"
+
+# What the user asked to do with a transcript; summary wins if both are mentioned
+_YT_SUMMARY_RE = re.compile(r'summarize|summary|tldr', re.IGNORECASE)
+_YT_SENTIMENT_RE = re.compile(r'sentiment|tone', re.IGNORECASE)
+
+# Static instructions are sent as a separate, cache_control-marked block ahead of the
+# content so the prefix is byte-identical across requests and can be served from
+# Anthropic's prompt cache
+_SUMMARY_TEMPLATE = """Provide a comprehensive summary in this EXACT format:
+
+**One-line summary:** [Write a single, concise sentence capturing the main point]
+
+**Key Points:**
+• [First key point]
+• [Second key point]
+• [Third key point]
+
+**Detailed Summary:**
+[Write exactly 5 sentences providing a thorough overview of the content. Cover the main themes, important details, and conclusions.]
+"""
+
+_SENTIMENT_TEMPLATE = """Analyze the sentiment of the following content and return in this EXACT format:
+
+**Sentiment:** [Choose: Positive, Negative, Neutral, or Mixed]
+**Confidence:** [Provide percentage, e.g., 85%]
+**Justification:** [Write ONE clear sentence explaining why you chose this sentiment]
+"""
+
+_CODE_TEMPLATE = """Analyze this code and provide a comprehensive explanation in this format:
+
+**Purpose:**
+[Explain what this code is designed to do]
+
+**Logic Explanation:**
+[Provide a step-by-step breakdown of how the code works]
+
+**Bugs/Issues:**
+[Identify any bugs, potential issues, or code smells. If none found, state "No obvious bugs detected."]
+
+**Complexity Analysis:**
+[Provide time and space complexity analysis if applicable. Use Big O notation.]
+"""
+
+_ACTIONS_TEMPLATE = """Extract all action items, tasks, and to-dos from the following content.
+
+Format your response as:
+
+**Action Items:**
+1. [Action item with owner if mentioned and deadline if specified]
+2. [Action item with owner if mentioned and deadline if specified]
+...
+
+If no action items are found, respond with: "No action items found in the content."
+"""
+
+_CLARIFICATION_TEMPLATE = """The user has provided content but hasn't clearly specified what they want to do with it.
+
+Ask them a short, clear clarifying question. Examples:
+- "What would you like me to do with this content? I can summarize it, analyze sentiment, explain code, extract action items, or answer questions about it."
+- "How can I help you with this file?"
+- "What specific information are you looking for from this content?"
+
+Keep the question friendly and concise. Offer specific options based on what seems most relevant.
+"""
+
+_CONVERSATIONAL_TEMPLATE = """Provide a helpful, friendly response to the user's question or comment.
+
+Be concise but informative. If the user is asking about specific content, reference it directly.
+"""
+
+_YOUTUBE_FALLBACK_TEMPLATE = """The user provided a YouTube URL but the transcript could not be fetched automatically.
+
+Explain this limitation politely and suggest:
+1. They can try pasting the transcript manually if they have access to it
+2. They can describe what they'd like to know about the video
+3. In a production system, this would use the YouTube Transcript API
+"""
+
+
+# Default prompt body budget, leaving room in the 200k context for instructions and
+# output; budgets are counted with cl100k_base, which undercounts Claude's tokens
+DEFAULT_TOKEN_BUDGET = 150_000
+
+
+class TaskConfig(NamedTuple):
+    """Per-task generation settings"""
+    max_tokens: int
+    template: str
+    # Heading placed above the content; empty when the handler builds the body itself
+    label: str = ""
+    # Longest prompt body sent, in tokens; longer bodies are truncated
+    budget: int = DEFAULT_TOKEN_BUDGET
+
+
+TASK_CFG = {
+    'summarization': TaskConfig(1500, _SUMMARY_TEMPLATE, "Content to summarize:"),
+    'sentiment_analysis': TaskConfig(500, _SENTIMENT_TEMPLATE, "Content to analyze:"),
+    'code_explanation': TaskConfig(2000, _CODE_TEMPLATE, "Code to analyze:"),
+    'action_items': TaskConfig(1000, _ACTIONS_TEMPLATE, "Content to analyze:"),
+    'clarification': TaskConfig(300, _CLARIFICATION_TEMPLATE, budget=8000),
+    'conversational': TaskConfig(1000, _CONVERSATIONAL_TEMPLATE),
+    'youtube_transcript': TaskConfig(500, _YOUTUBE_FALLBACK_TEMPLATE)
+}
+
 
 class TaskExecutor:
     """
@@ -16,18 +163,47 @@ class TaskExecutor:
     Uses Claude AI for intelligent processing
     """
     
-    def __init__(self, api_key: str):
+    # Task type -> handler method, bound once per instance in __init__
+    _HANDLER_NAMES = {
+        'summarization': '_handle_summary',
+        'sentiment_analysis': '_handle_sentiment',
+        'code_explanation': '_handle_code',
+        'action_items': '_handle_actions',
+        'needs_clarification': '_handle_clarification',
+        'conversational': '_handle_conversational',
+        'youtube_transcript': '_handle_youtube'
+    }
+    
+    def __init__(
+        self,
+        api_key: str,
+        cache: Optional[LLMCache] = None,
+        limiter: Optional[RateLimiter] = None
+    ):
         """
         Initialize task executor with Anthropic API key
         
         Args:
             api_key: Anthropic API key
+            cache: Optional result cache, defaults to Redis (REDIS_URL) or in-process memory
+            limiter: Optional rate limiter, defaults to the CLAUDE_RPM/CLAUDE_TPM limits
         """
         if not api_key:
             raise ValueError("ANTHROPIC_API_KEY is required")
         
-        self.client = Anthropic(api_key=api_key)
+        # Async client so a Claude round trip doesn't block the event loop;
+        # shared across executors so connections are pooled
+        self.client = _get_client(api_key)
         self.model = "claude-sonnet-4-20250514"
+        self.cache = cache or LLMCache()
+        self.limiter = limiter or RateLimiter()
+        # Long transcripts are condensed by a cheaper model before summarization;
+        # that model has its own rate limits, so its calls use separate buckets
+        compressor_limiter = RateLimiter(COMPRESSOR_RPM / WEB_WORKERS, COMPRESSOR_TPM / WEB_WORKERS)
+        self.compressor = ContextCompressor(functools.partial(self._create, limiter=compressor_limiter))
+        self._handlers: Dict[str, Callable] = {
+            task_type: getattr(self, name) for task_type, name in self._HANDLER_NAMES.items()
+        }
         logger.info("TaskExecutor initialized with Claude Sonnet 4")
     
     async def execute(self, task_type: str, content: str, original_query: str = "") -> Dict:
@@ -42,235 +218,466 @@ class TaskExecutor:
         Returns:
             Dict with task result
         """
-        logger.info(f"Executing task: {task_type}")
+        logger.info("Executing task: %s", task_type)
         
-        handlers = {
-            'summarization': self._handle_summary,
-            'sentiment_analysis': self._handle_sentiment,
-            'code_explanation': self._handle_code,
-            'action_items': self._handle_actions,
-            'needs_clarification': self._handle_clarification,
-            'conversational': self._handle_conversational,
-            'youtube_transcript': self._handle_youtube
-        }
+        cache_key = self.cache.make_key(task_type, self.model, content, original_query)
+        cached = await self.cache.get(cache_key)
+        if cached is not None:
+            logger.info("Task %s served from cache", task_type)
+            return cached
         
-        handler = handlers.get(task_type, self._handle_conversational)
+        handler = self._handlers.get(task_type, self._handle_conversational)
         
         try:
             result = await handler(content, original_query)
-            logger.info(f"Task {task_type} completed successfully")
+            logger.info("Task %s completed successfully", task_type)
+            await self.cache.set(cache_key, result)
             return result
         except Exception as e:
-            logger.error(f"Task execution failed: {str(e)}", exc_info=True)
+            logger.error("Task execution failed: %s", e, exc_info=True)
             return {
                 'task': task_type,
                 'result': f"Error executing task: {str(e)}",
                 'error': True
             }
     
-    async def _handle_summary(self, content: str, query: str = "") -> Dict:
+    async def stream(
+        self,
+        task_type: str,
+        content: str,
+        original_query: str = ""
+    ) -> AsyncIterator[str]:
         """
-        Generate structured summary (1-line + 3 bullets + 5 sentences)
+        Execute task and stream the result text as Claude generates it
+        
+        Args:
+            task_type: Type of task to execute
+            content: Content to process
+            original_query: Original user query
+        
+        Yields:
+            Chunks of the task result text
         """
-        prompt = f"""Provide a comprehensive summary in this EXACT format:
-
-**One-line summary:** [Write a single, concise sentence capturing the main point]
-
-**Key Points:**
-• [First key point]
-• [Second key point]
-• [Third key point]
-
-**Detailed Summary:**
-[Write exactly 5 sentences providing a thorough overview of the content. Cover the main themes, important details, and conclusions.]
-
-Content to summarize:
-{content}
-"""
+        logger.info("Streaming task: %s", task_type)
         
-        response = self.client.messages.create(
-            model=self.model,
-            max_tokens=1500,
-            messages=[{"role": "user", "content": prompt}]
-        )
+        cache_key = self.cache.make_key(task_type, self.model, content, original_query)
+        cached = await self.cache.get(cache_key)
+        if cached is not None:
+            logger.info("Task %s served from cache", task_type)
+            yield cached['result']
+            return
         
-        return {
-            'task': 'summarization',
-            'result': response.content[0].text
-        }
+        handler = self._handlers.get(task_type, self._handle_conversational)
+        
+        try:
+            chunks = await handler(content, original_query, stream=True)
+            parts = []
+            try:
+                async for chunk in chunks:
+                    parts.append(chunk)
+                    yield chunk
+            finally:
+                # Close the Claude stream now if the consumer stopped early
+                await chunks.aclose()
+            logger.info("Task %s streamed successfully", task_type)
+            await self.cache.set(cache_key, {'task': task_type, 'result': ''.join(parts)})
+        except Exception as e:
+            logger.error("Task streaming failed: %s", e, exc_info=True)
+            yield f"Error executing task: {str(e)}"
     
-    async def _handle_sentiment(self, content: str, query: str = "") -> Dict:
+    async def _complete(
+        self,
+        task: str,
+        prompt: str,
+        max_tokens: int,
+        stream: bool = False,
+        instructions: Optional[str] = None
+    ) -> HandlerResult:
         """
-        Analyze sentiment with confidence score
+        Send a single-turn prompt to Claude
+        
+        Args:
+            task: Task name reported in the result
+            prompt: User prompt
+            max_tokens: Maximum tokens to generate
+            stream: Return an iterator of text chunks instead of the full result
+            instructions: Static instructions sent ahead of the prompt as a cacheable block
+        
+        Returns:
+            Dict with task result, or an async iterator of text chunks when streaming
         """
-        prompt = f"""Analyze the sentiment of the following content and return in this EXACT format:
-
-**Sentiment:** [Choose: Positive, Negative, Neutral, or Mixed]
-**Confidence:** [Provide percentage, e.g., 85%]
-**Justification:** [Write ONE clear sentence explaining why you chose this sentiment]
-
-Content to analyze:
-{content}
-"""
+        messages = self._build_messages(prompt, instructions)
         
-        response = self.client.messages.create(
-            model=self.model,
-            max_tokens=500,
-            messages=[{"role": "user", "content": prompt}]
-        )
+        if stream:
+            return self._stream_text(messages, max_tokens)
+        
+        response = await self._create(max_tokens=max_tokens, messages=messages)
         
         return {
-            'task': 'sentiment_analysis',
+            'task': task,
             'result': response.content[0].text
         }
     
-    async def _handle_code(self, content: str, query: str = "") -> Dict:
-        """
-        Explain code with bug detection and complexity analysis
+    @staticmethod
+    def _build_messages(prompt: str, instructions: Optional[str] = None) -> list:
+        """Build a single user turn, with instructions as a cacheable leading block"""
+        if instructions:
+            user_content = [
+                {"type": "text", "text": instructions, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": prompt}
+            ]
+        else:
+            user_content = prompt
+        return [{"role": "user", "content": user_content}]
+    
+    async def _create(self, limiter: Optional[RateLimiter] = None, **params):
         """
-        prompt = f"""Analyze this code and provide a comprehensive explanation in this format:
-
-**Purpose:**
-[Explain what this code is designed to do]
-
-**Logic Explanation:**
-[Provide a step-by-step breakdown of how the code works]
-
-**Bugs/Issues:**
-[Identify any bugs, potential issues, or code smells. If none found, state "No obvious bugs detected."]
-
-**Complexity Analysis:**
-[Provide time and space complexity analysis if applicable. Use Big O notation.]
-
-Code to analyze:
-{content}
-"""
+        Call messages.create within the rate limits, with retries; model defaults to self.model
         
-        response = self.client.messages.create(
-            model=self.model,
-            max_tokens=2000,
-            messages=[{"role": "user", "content": prompt}]
-        )
+        Args:
+            limiter: Limiter for the call's model, defaults to self.limiter
+        """
+        limiter = limiter or self.limiter
+        async for attempt in limiter.retrying():
+            with attempt:
+                async with limiter.slot(params["messages"]):
+                    return await self.client.messages.create(**{"model": self.model, **params})
+    
+    async def _stream_text(self, messages: list, max_tokens: int) -> AsyncIterator[str]:
+        """Yield text deltas from a streamed Claude response"""
+        async with self.limiter.concurrency:
+            # Only opening the stream is retried; a 429 arrives before any text
+            async for attempt in self.limiter.retrying():
+                with attempt:
+                    await self.limiter.acquire(messages)
+                    stream_manager = self.client.messages.stream(
+                        model=self.model,
+                        max_tokens=max_tokens,
+                        messages=messages
+                    )
+                    response_stream = await stream_manager.__aenter__()
+            
+            try:
+                async for text in response_stream.text_stream:
+                    yield text
+            finally:
+                await stream_manager.__aexit__(None, None, None)
+    
+    async def _call(self, task: str, prompt_body: str, stream: bool = False) -> HandlerResult:
+        """
+        Run a configured task: its cached instructions, then the prompt body
         
-        return {
-            'task': 'code_explanation',
-            'result': response.content[0].text
-        }
+        Args:
+            task: Key of TASK_CFG, also reported in the result
+            prompt_body: Request-specific text, placed under the task's label if it has one
+            stream: Return an iterator of text chunks instead of the full result
+        """
+        cfg = TASK_CFG[task]
+        # Oversized input would burn tokens or be rejected only after the upload
+        prompt_body = truncate_to_tokens(prompt_body, cfg.budget)
+        if cfg.label:
+            prompt_body = f"{cfg.label}\n{prompt_body}\n"
+        return await self._complete(task, prompt_body, cfg.max_tokens, stream, instructions=cfg.template)
+    
+    async def _handle_summary(
+        self,
+        content: str,
+        query: str = "",
+        stream: bool = False
+    ) -> HandlerResult:
+        """
+        Generate structured summary (1-line + 3 bullets + 5 sentences)
+        """
+        return await self._call('summarization', content, stream)
+    
+    async def _handle_sentiment(
+        self,
+        content: str,
+        query: str = "",
+        stream: bool = False
+    ) -> HandlerResult:
+        """
+        Analyze sentiment with confidence score
+        """
+        return await self._call('sentiment_analysis', content, stream)
     
-    async def _handle_actions(self, content: str, query: str = "") -> Dict:
+    async def _handle_code(
+        self,
+        content: str,
+        query: str = "",
+        stream: bool = False
+    ) -> HandlerResult:
+        """
+        Explain code with bug detection and complexity analysis
+        """
+        return await self._call('code_explanation', content, stream)
+    
+    async def _handle_actions(
+        self,
+        content: str,
+        query: str = "",
+        stream: bool = False
+    ) -> HandlerResult:
         """
         Extract action items and tasks from content
         """
-        prompt = f"""Extract all action items, tasks, and to-dos from the following content.
+        return await self._call('action_items', content, stream)
+    
+    async def _handle_clarification(
+        self,
+        content: str,
+        query: str = "",
+        stream: bool = False
+    ) -> HandlerResult:
+        """
+        Ask clarifying question when intent is unclear
+        """
+        return await self._call('clarification', f"User's query: {query}\nContent provided: {content[:200]}...\n", stream)
+    
+    async def _handle_conversational(
+        self,
+        content: str,
+        query: str = "",
+        stream: bool = False
+    ) -> HandlerResult:
+        """
+        Handle general conversational queries
+        """
+        context = f"Context: {content}" if content != query else ""
+        return await self._call('conversational', f"User's query: {query}\n{context}\n", stream)
+    
+    async def _handle_youtube(
+        self,
+        content: str,
+        query: str = "",
+        stream: bool = False
+    ) -> HandlerResult:
+        """
+        Handle YouTube transcript processing
+        """
+        # Check if transcript was successfully fetched
+        if YOUTUBE_TRANSCRIPT_MARKER in content:
+            # Determine what to do with transcript based on query; default to summary
+            if _YT_SENTIMENT_RE.search(query) and not _YT_SUMMARY_RE.search(query):
+                return await self._handle_sentiment(content, query, stream)
+            return await self._handle_summary(await self._compress_transcript(content), query, stream)
+        else:
+            # Transcript fetch failed
+            return await self._call('youtube_transcript', f"User's query: {query}\n", stream)
+    
+    async def _compress_transcript(self, content: str) -> str:
+        """Compress the transcript part of YouTube content, keeping the user's text intact"""
+        head, transcript = content.split(YOUTUBE_TRANSCRIPT_MARKER, 1)
+        return head + YOUTUBE_TRANSCRIPT_MARKER + "\n" + await self.compressor.compress(transcript.lstrip("\n"))
 
-Format your response as:
 
-**Action Items:**
-1. [Action item with owner if mentioned and deadline if specified]
-2. [Action item with owner if mentioned and deadline if specified]
-...
+# Tasks whose prompt is fixed instructions plus content, so several contents can share one call
+BATCHABLE_TASKS = frozenset({'summarization', 'sentiment_analysis', 'action_items'})
 
-If no action items are found, respond with: "No action items found in the content."
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = int(os.getenv("BATCH_MAX_WAIT_MS", "50"))
+# Output cap for one combined call; batches are sized so every item's max_tokens fits
+BATCH_MAX_OUTPUT_TOKENS = 16000
+# Longer contents (~4k tokens) are sent on their own rather than inflating a shared prompt
+BATCH_ITEM_MAX_CHARS = 16000
 
-Content to analyze:
-{content}
-"""
+
+class BatchingTaskExecutor(TaskExecutor):
+    """
+    Task executor that coalesces concurrent requests into one Claude call
+    
+    Summarization, sentiment and action-item requests arriving within a short
+    window are sent together and answered as a JSON array, trading a little
+    latency for far fewer requests per minute. Other tasks and streamed
+    requests go straight through.
+    
+    Contents from unrelated requests share one prompt, so instructions
+    embedded in one user's upload can steer or leak into another user's
+    answer. Only enable this for trusted, single-tenant deployments.
+    """
+    
+    def __init__(
+        self,
+        *args,
+        max_batch: int = BATCH_MAX_SIZE,
+        max_wait_ms: int = BATCH_MAX_WAIT_MS,
+        **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
         
-        response = self.client.messages.create(
-            model=self.model,
-            max_tokens=1000,
-            messages=[{"role": "user", "content": prompt}]
-        )
+        for task_type in BATCHABLE_TASKS:
+            self._handlers[task_type] = self._batched(task_type, self._handlers[task_type])
+    
+    def _batched(self, task_type: str, handler: Callable) -> Callable:
+        """Wrap a handler so non-streamed requests go through the task's queue"""
+        async def batched_handler(content: str, query: str = "", stream: bool = False):
+            if stream or len(content) > BATCH_ITEM_MAX_CHARS:
+                return await handler(content, query, stream)
+            return await self._enqueue(task_type, content)
         
-        return {
-            'task': 'action_items',
-            'result': response.content[0].text
-        }
+        return batched_handler
+    
+    async def _enqueue(self, task_type: str, content: str) -> Dict:
+        """Queue content for the next batch and wait for its result"""
+        queue = self._queues.get(task_type)
+        if queue is None:
+            queue = self._queues[task_type] = asyncio.Queue()
+            self._workers[task_type] = asyncio.create_task(self._batch_worker(task_type, queue))
+        
+        future = asyncio.get_running_loop().create_future()
+        await queue.put((content, future))
+        return await future
     
-    async def _handle_clarification(self, content: str, query: str = "") -> Dict:
+    async def _batch_worker(self, task_type: str, queue: asyncio.Queue):
+        """Drain up to max_batch items, or whatever arrived within max_wait"""
+        loop = asyncio.get_running_loop()
+        # Never batch more items than the combined output cap can answer in full
+        max_items = min(self.max_batch, max(1, BATCH_MAX_OUTPUT_TOKENS // TASK_CFG[task_type].max_tokens))
+        while True:
+            items = [await queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(items) < max_items:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                results = await self._run_batch(task_type, [content for content, _ in items])
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            for (_, future), result in zip(items, results):
+                if future.done():
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+    
+    async def _run_batch(self, task_type: str, contents: List[str]) -> List[Union[Dict, BaseException]]:
         """
-        Ask clarifying question when intent is unclear
+        Answer every content in one call, falling back to one call each
+        
+        Returns:
+            One result dict or exception per content, in order
         """
-        prompt = f"""The user has provided content but hasn't clearly specified what they want to do with it.
-
-Ask them a short, clear clarifying question. Examples:
-- "What would you like me to do with this content? I can summarize it, analyze sentiment, explain code, extract action items, or answer questions about it."
-- "How can I help you with this file?"
-- "What specific information are you looking for from this content?"
-
-Keep the question friendly and concise. Offer specific options based on what seems most relevant.
-
-User's query: {query}
-Content provided: {content[:200]}...
-"""
+        cfg = TASK_CFG[task_type]
+        
+        if len(contents) == 1:
+            return await self._run_individually(task_type, contents)
         
-        response = self.client.messages.create(
-            model=self.model,
-            max_tokens=300,
-            messages=[{"role": "user", "content": prompt}]
+        # The items share one context window, so each gets an equal part of the budget
+        item_budget = cfg.budget // len(contents)
+        items = "\n".join(
+            f"[{i}] {truncate_to_tokens(content, item_budget)}" for i, content in enumerate(contents, 1)
         )
+        prompt = (
+            f"Process each item below and return ONLY a JSON array of length {len(contents)}. "
+            f"Element i is your complete response for item [i], as a string in the format above.\n\n"
+            f"{items}\n"
+        )
+        try:
+            response = await self._create(
+                max_tokens=cfg.max_tokens * len(contents),
+                messages=self._build_messages(prompt, cfg.template)
+            )
+        except Exception as e:
+            # One bad item must not fail the others, so each gets its own call
+            logger.warning("Batched %s call failed, retrying individually: %s", task_type, e)
+            return await self._run_individually(task_type, contents)
         
-        return {
-            'task': 'clarification',
-            'result': response.content[0].text
-        }
+        answers = self._parse_batch(response.content[0].text, len(contents))
+        if answers is None:
+            logger.warning("Batched %s response was not a %s-item array, retrying individually", task_type, len(contents))
+            return await self._run_individually(task_type, contents)
+        
+        logger.info("Batched %s %s requests into one call", len(contents), task_type)
+        return [{'task': task_type, 'result': answer} for answer in answers]
     
-    async def _handle_conversational(self, content: str, query: str = "") -> Dict:
-        """
-        Handle general conversational queries
+    async def _run_individually(self, task_type: str, contents: List[str]) -> List[Union[Dict, BaseException]]:
+        """One call per content; a failure is returned in place of that content's result"""
+        return await asyncio.gather(
+            *(self._call(task_type, content) for content in contents),
+            return_exceptions=True
+        )
+    
+    @staticmethod
+    def _parse_batch(text: str, expected: int) -> Optional[List[str]]:
+        """Extract the JSON array of answers, or None if it doesn't match"""
+        start, end = text.find('['), text.rfind(']')
+        if start == -1 or end < start:
+            return None
+        try:
+            answers = json.loads(text[start:end + 1])
+        except ValueError:
+            return None
+        if not isinstance(answers, list) or len(answers) != expected:
+            return None
+        return [answer if isinstance(answer, str) else json.dumps(answer) for answer in answers]
+    
+    async def submit_offline_batch(self, task_type: str, contents: List[str]) -> str:
         """
-        prompt = f"""Provide a helpful, friendly response to the user's question or comment.
-
-Be concise but informative. If the user is asking about specific content, reference it directly.
-
-User's query: {query}
-{f"Context: {content}" if content != query else ""}
-"""
+        Submit contents through the Message Batches API (half price, results within 24h)
         
-        response = self.client.messages.create(
-            model=self.model,
-            max_tokens=1000,
-            messages=[{"role": "user", "content": prompt}]
-        )
+        Args:
+            task_type: One of BATCHABLE_TASKS
+            contents: Contents to process
         
-        return {
-            'task': 'conversational',
-            'result': response.content[0].text
-        }
+        Returns:
+            Batch ID to pass to collect_offline_batch
+        """
+        cfg = TASK_CFG[task_type]
+        batch = await self.client.messages.batches.create(
+            requests=[
+                {
+                    "custom_id": str(i),
+                    "params": {
+                        "model": self.model,
+                        "max_tokens": cfg.max_tokens,
+                        "messages": self._build_messages(
+                            f"{cfg.label}\n{truncate_to_tokens(content, cfg.budget)}\n", cfg.template
+                        )
+                    }
+                }
+                for i, content in enumerate(contents)
+            ]
+        )
+        logger.info("Submitted offline batch %s with %s %s requests", batch.id, len(contents), task_type)
+        return batch.id
     
-    async def _handle_youtube(self, content: str, query: str = "") -> Dict:
+    async def collect_offline_batch(self, batch_id: str, task_type: str) -> Optional[List[Dict]]:
         """
-        Handle YouTube transcript processing
+        Fetch results of an offline batch in submission order
+        
+        Returns:
+            List of result dicts, or None while the batch is still processing
         """
-        # Check if transcript was successfully fetched
-        if "[YouTube Transcript]:" in content:
-            # Determine what to do with transcript based on query
-            if any(word in query.lower() for word in ['summarize', 'summary', 'tldr']):
-                return await self._handle_summary(content, query)
-            elif any(word in query.lower() for word in ['sentiment', 'tone']):
-                return await self._handle_sentiment(content, query)
+        batch = await self.client.messages.batches.retrieve(batch_id)
+        if batch.processing_status != "ended":
+            return None
+        
+        results: Dict[int, Dict] = {}
+        async for entry in await self.client.messages.batches.results(batch_id):
+            if entry.result.type == "succeeded":
+                results[int(entry.custom_id)] = {
+                    'task': task_type,
+                    'result': entry.result.message.content[0].text
+                }
             else:
-                # Default to summary for YouTube
-                return await self._handle_summary(content, query)
-        else:
-            # Transcript fetch failed
-            prompt = f"""The user provided a YouTube URL but the transcript could not be fetched automatically.
-
-Explain this limitation politely and suggest:
-1. They can try pasting the transcript manually if they have access to it
-2. They can describe what they'd like to know about the video
-3. In a production system, this would use the YouTube Transcript API
-
-User's query: {query}
-"""
-            
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=500,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            
-            return {
-                'task': 'youtube_transcript',
-                'result': response.content[0].text
-            }
\ No newline at end of file
+                results[int(entry.custom_id)] = {
+                    'task': task_type,
+                    'result': f"Error executing task: batch request {entry.result.type}",
+                    'error': True
+                }
+        return [results[i] for i in sorted(results)]
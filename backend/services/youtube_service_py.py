@@ -3,36 +3,51 @@ YouTube Service
 Extracts and processes YouTube video transcripts
 """
 
-import re
+import asyncio
+import io
 import logging
-from typing import Optional
+from typing import Dict, Optional, Tuple
+from cachetools import TTLCache
+from services.intent_detector import YOUTUBE_URL_RE
+
+try:
+    from youtube_transcript_api import YouTubeTranscriptApi
+    from youtube_transcript_api._errors import TranscriptsDisabled, NoTranscriptFound
+except ImportError:
+    YouTubeTranscriptApi = None
 
 logger = logging.getLogger(__name__)
 
+TRANSCRIPT_CACHE_SIZE = 1024
+TRANSCRIPT_CACHE_TTL = 3600
+
+# Zero-padded "00".."3599" so timestamps are built by lookup, covering videos up to 60 hours
+_TWO_DIGITS = [f"{i:02d}" for i in range(3600)]
+
+# The transcript API does blocking HTTP, so fetches run in threads; cap how many at once
+TRANSCRIPT_FETCH_CONCURRENCY = 8
+
 
 class YouTubeService:
     """
     Handles YouTube URL detection and transcript extraction
     """
     
-    # YouTube URL patterns
-    URL_PATTERNS = [
-        r'(?:https?://)?(?:www\.)?youtube\.com/watch\?v=([a-zA-Z0-9_-]{11})',
-        r'(?:https?://)?(?:www\.)?youtu\.be/([a-zA-Z0-9_-]{11})',
-        r'(?:https?://)?(?:www\.)?youtube\.com/embed/([a-zA-Z0-9_-]{11})',
-    ]
-    
     def __init__(self):
-        self.compiled_patterns = [re.compile(pattern) for pattern in self.URL_PATTERNS]
+        # Joined transcripts keyed by (video_id, language); failures are not cached
+        self._transcript_cache = TTLCache(maxsize=TRANSCRIPT_CACHE_SIZE, ttl=TRANSCRIPT_CACHE_TTL)
+        # One in-flight fetch per key, so concurrent requests for a video share it;
+        # an entry is dropped as soon as its fetch finishes
+        self._fetches: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._fetch_sem: Optional[asyncio.Semaphore] = None
         self._check_dependencies()
     
     def _check_dependencies(self):
         """Check if youtube-transcript-api is available"""
-        try:
-            from youtube_transcript_api import YouTubeTranscriptApi
+        if YouTubeTranscriptApi is not None:
             self.transcript_available = True
             logger.info("YouTube Transcript API is available")
-        except ImportError:
+        else:
             self.transcript_available = False
             logger.warning("YouTube Transcript API not available. Install: pip install youtube-transcript-api")
     
@@ -49,13 +64,12 @@ class YouTubeService:
         if not text:
             return None
         
-        for pattern in self.compiled_patterns:
-            match = pattern.search(text)
-            if match:
-                video_id = match.group(1)
-                url = f"https://www.youtube.com/watch?v={video_id}"
-                logger.info(f"YouTube URL detected: {url}")
-                return url
+        # One pass over the text matches watch, short and embed URLs
+        match = YOUTUBE_URL_RE.search(text)
+        if match:
+            url = f"https://www.youtube.com/watch?v={match.group(1)}"
+            logger.info("YouTube URL detected: %s", url)
+            return url
         
         return None
     
@@ -69,12 +83,8 @@ class YouTubeService:
         Returns:
             Video ID if found, None otherwise
         """
-        for pattern in self.compiled_patterns:
-            match = pattern.search(url)
-            if match:
-                return match.group(1)
-        
-        return None
+        match = YOUTUBE_URL_RE.search(url)
+        return match.group(1) if match else None
     
     async def get_transcript(self, url: str, language: str = 'en') -> Optional[str]:
         """
@@ -91,41 +101,70 @@ class YouTubeService:
             logger.warning("YouTube Transcript API not available")
             return None
         
+        video_id = self.extract_video_id(url)
+        if not video_id:
+            logger.error("Could not extract video ID from URL: %s", url)
+            return None
+        
+        cache_key = (video_id, language)
+        transcript = self._transcript_cache.get(cache_key)
+        if transcript is not None:
+            logger.info("Transcript for video %s served from cache", video_id)
+            return transcript
+        
+        fetch = self._fetches.get(cache_key)
+        if fetch is None:
+            fetch = asyncio.ensure_future(self._fetch_and_cache(video_id, language))
+            self._fetches[cache_key] = fetch
+            fetch.add_done_callback(lambda _: self._fetches.pop(cache_key, None))
+        # Shielded so a caller that goes away doesn't cancel the fetch for the others
+        return await asyncio.shield(fetch)
+    
+    async def _fetch_and_cache(self, video_id: str, language: str) -> Optional[str]:
+        """Fetch a transcript and cache it if the fetch succeeded"""
+        transcript = await self._fetch_transcript(video_id, language)
+        if transcript is not None:
+            self._transcript_cache[(video_id, language)] = transcript
+        return transcript
+    
+    def _fetch_slot(self) -> asyncio.Semaphore:
+        """Semaphore bounding fetch threads, created lazily so it binds to the running event loop"""
+        if self._fetch_sem is None:
+            self._fetch_sem = asyncio.Semaphore(TRANSCRIPT_FETCH_CONCURRENCY)
+        return self._fetch_sem
+    
+    async def _fetch_transcript(self, video_id: str, language: str) -> Optional[str]:
+        """Fetch and join a transcript from YouTube, None on failure"""
         try:
-            from youtube_transcript_api import YouTubeTranscriptApi
-            from youtube_transcript_api._errors import TranscriptsDisabled, NoTranscriptFound
-            
-            video_id = self.extract_video_id(url)
-            if not video_id:
-                logger.error(f"Could not extract video ID from URL: {url}")
-                return None
+            logger.info("Fetching transcript for video: %s", video_id)
             
-            logger.info(f"Fetching transcript for video: {video_id}")
-            
-            # Try to get transcript in preferred language
-            try:
-                transcript_list = YouTubeTranscriptApi.get_transcript(video_id, languages=[language])
-            except NoTranscriptFound:
-                # Try to get any available transcript
-                logger.info(f"No {language} transcript found, trying any available language")
-                transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
+            async with self._fetch_slot():
+                # Try to get transcript in preferred language
+                try:
+                    transcript_list = await asyncio.to_thread(
+                        YouTubeTranscriptApi.get_transcript, video_id, languages=[language]
+                    )
+                except NoTranscriptFound:
+                    # Try to get any available transcript
+                    logger.info("No %s transcript found, trying any available language", language)
+                    transcript_list = await asyncio.to_thread(YouTubeTranscriptApi.get_transcript, video_id)
             
             # Combine all transcript segments
-            transcript = " ".join([entry['text'] for entry in transcript_list])
+            transcript = " ".join(entry['text'] for entry in transcript_list)
             
-            logger.info(f"Transcript fetched successfully. Length: {len(transcript)} characters")
+            logger.info("Transcript fetched successfully. Length: %s characters", len(transcript))
             return transcript
         
         except TranscriptsDisabled:
-            logger.warning(f"Transcripts disabled for video: {url}")
+            logger.warning("Transcripts disabled for video: %s", video_id)
             return None
         
         except NoTranscriptFound:
-            logger.warning(f"No transcript found for video: {url}")
+            logger.warning("No transcript found for video: %s", video_id)
             return None
         
         except Exception as e:
-            logger.error(f"Error fetching transcript: {str(e)}", exc_info=True)
+            logger.error("Error fetching transcript: %s", e, exc_info=True)
             return None
     
     async def get_transcript_with_timestamps(self, url: str, language: str = 'en') -> Optional[list]:
@@ -143,17 +182,18 @@ class YouTubeService:
             return None
         
         try:
-            from youtube_transcript_api import YouTubeTranscriptApi
-            
             video_id = self.extract_video_id(url)
             if not video_id:
                 return None
             
-            transcript_list = YouTubeTranscriptApi.get_transcript(video_id, languages=[language])
+            async with self._fetch_slot():
+                transcript_list = await asyncio.to_thread(
+                    YouTubeTranscriptApi.get_transcript, video_id, languages=[language]
+                )
             return transcript_list
         
         except Exception as e:
-            logger.error(f"Error fetching timestamped transcript: {str(e)}")
+            logger.error("Error fetching timestamped transcript: %s", e)
             return None
     
     def format_transcript(self, transcript_data: list) -> str:
@@ -169,13 +209,13 @@ class YouTubeService:
         if not transcript_data:
             return ""
         
-        formatted = []
+        # Write lines straight into one buffer rather than keeping a list of them
+        buffer = io.StringIO()
         for entry in transcript_data:
             timestamp = self._format_timestamp(entry['start'])
-            text = entry['text']
-            formatted.append(f"[{timestamp}] {text}")
+            buffer.write(f"[{timestamp}] {entry['text']}\n")
         
-        return "\n".join(formatted)
+        return buffer.getvalue().rstrip("\n")
     
     @staticmethod
     def _format_timestamp(seconds: float) -> str:
@@ -188,6 +228,7 @@ class YouTubeService:
         Returns:
             Formatted timestamp string
         """
-        minutes = int(seconds // 60)
-        secs = int(seconds % 60)
+        minutes, secs = divmod(int(seconds), 60)
+        if minutes < len(_TWO_DIGITS):
+            return _TWO_DIGITS[minutes] + ":" + _TWO_DIGITS[secs]
         return f"{minutes:02d}:{secs:02d}"
\ No newline at end of file
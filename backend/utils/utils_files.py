@@ -3,35 +3,74 @@
 Input validation utilities
 """
 
+import os
 from fastapi import UploadFile, HTTPException
 
+try:
+    import magic
+except ImportError:  # python-magic or the libmagic library is missing
+    magic = None
+
 
 # Maximum file size: 10MB
 MAX_FILE_SIZE = 10 * 1024 * 1024
 
+# Read size when counting an upload without a known size
+SIZE_CHECK_CHUNK = 64 * 1024
+
 # Allowed file types
-ALLOWED_MIME_TYPES = {
+ALLOWED_MIME_TYPES = frozenset({
     'image/jpeg', 'image/jpg', 'image/png', 'image/bmp', 'image/gif',
     'application/pdf',
     'audio/mpeg', 'audio/mp3', 'audio/wav', 'audio/x-wav', 
     'audio/mp4', 'audio/x-m4a', 'audio/ogg'
+})
+
+# Extensions checked before anything is read from the upload, with the MIME
+# major type each one must be declared and sniffed as
+_EXT_FAMILIES = {
+    '.jpg': 'image', '.jpeg': 'image', '.png': 'image', '.bmp': 'image', '.gif': 'image',
+    '.pdf': 'application',
+    '.mp3': 'audio', '.wav': 'audio', '.m4a': 'audio', '.ogg': 'audio', '.mp4': 'audio'
+}
+
+# libmagic names for allowed content that differ from the client-facing MIME types
+_SNIFFED_ALIASES = {
+    'image/x-ms-bmp': 'image/bmp',
+    'audio/x-wave': 'audio/wav',
+    'audio/vnd.wave': 'audio/wav',
+    'video/mp4': 'audio/mp4',
+    'application/ogg': 'audio/ogg'
 }
 
+# Bytes read for content sniffing
+SNIFF_BYTES = 2048
 
-def validate_file_size(file: UploadFile) -> None:
+
+async def validate_file_size(file: UploadFile) -> None:
     """
     Validate file size
     
+    Uses the size Starlette recorded while receiving the upload, and only
+    counts bytes when that is missing, stopping as soon as the limit is passed
+    
     Args:
         file: Uploaded file
     
     Raises:
         HTTPException if file is too large
     """
-    # Read file to check size
-    file.file.seek(0, 2)  # Seek to end
-    file_size = file.file.tell()
-    file.file.seek(0)  # Reset to beginning
+    file_size = getattr(file, "size", None)
+    
+    if file_size is None:
+        file_size = 0
+        try:
+            while chunk := await file.read(SIZE_CHECK_CHUNK):
+                file_size += len(chunk)
+                if file_size > MAX_FILE_SIZE:
+                    break
+        finally:
+            await file.seek(0)  # Reset to beginning
     
     if file_size > MAX_FILE_SIZE:
         raise HTTPException(
@@ -40,21 +79,63 @@ def validate_file_size(file: UploadFile) -> None:
         )
 
 
-def validate_file_type(file: UploadFile) -> None:
+async def validate_file_type(file: UploadFile) -> None:
     """
     Validate file type
     
+    Checks the extension, then the client-supplied MIME type, then (when
+    python-magic is available) the actual content. All three must agree on
+    the kind of file (image, PDF or audio), since uploads are routed by the
+    declared type
+    
     Args:
         file: Uploaded file
     
     Raises:
         HTTPException if file type is not allowed
     """
+    ext = os.path.splitext(file.filename or "")[1].lower()
+    family = _EXT_FAMILIES.get(ext)
+    if family is None:
+        raise HTTPException(
+            status_code=415,
+            detail=f"File extension '{ext}' is not supported. Allowed types: images, PDFs, and audio files."
+        )
+    
     if file.content_type not in ALLOWED_MIME_TYPES:
         raise HTTPException(
             status_code=415,
             detail=f"File type '{file.content_type}' is not supported. Allowed types: images, PDFs, and audio files."
         )
+    
+    if _mime_family(file.content_type) != family:
+        raise HTTPException(
+            status_code=415,
+            detail=f"File type '{file.content_type}' does not match the '{ext}' extension."
+        )
+    
+    if magic is None:
+        return
+    
+    head = await file.read(SNIFF_BYTES)
+    await file.seek(0)
+    sniffed = magic.from_buffer(head, mime=True)
+    canonical = _SNIFFED_ALIASES.get(sniffed, sniffed)
+    if canonical not in ALLOWED_MIME_TYPES:
+        raise HTTPException(
+            status_code=415,
+            detail=f"File content ('{sniffed}') does not match a supported type. Allowed types: images, PDFs, and audio files."
+        )
+    if _mime_family(canonical) != family:
+        raise HTTPException(
+            status_code=415,
+            detail=f"File content ('{sniffed}') does not match the declared type '{file.content_type}'."
+        )
+
+
+def _mime_family(mime_type: str) -> str:
+    """Major type of a MIME type ('image', 'audio', or 'application' for PDFs)"""
+    return mime_type.split('/', 1)[0]
 
 
 def validate_text_input(text: str, min_length: int = 0, max_length: int = 50000) -> None:
@@ -87,8 +168,11 @@ def validate_text_input(text: str, min_length: int = 0, max_length: int = 50000)
 Logging configuration
 """
 
+import atexit
 import logging
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
 from typing import Optional
 
 
@@ -100,6 +184,9 @@ def setup_logger(
     """
     Setup logger with console and optional file output
     
+    Records are handed to a queue and written by a background listener thread,
+    so logging from request handlers never blocks on stdout or disk
+    
     Args:
         name: Logger name
         level: Logging level
@@ -125,13 +212,35 @@ def setup_logger(
         datefmt='%Y-%m-%d %H:%M:%S'
     )
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    handlers = [console_handler]
     
     # File handler (optional)
     if log_file:
         file_handler = logging.FileHandler(log_file)
         file_handler.setLevel(level)
         file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        handlers.append(file_handler)
     
-    return logger
\ No newline at end of file
+    log_queue = queue.Queue(-1)
+    logger.addHandler(QueueHandler(log_queue))
+    
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    # Keep a reference so the listener isn't collected, and flush on exit
+    logger.queue_listener = listener
+    atexit.register(listener.stop)
+    
+    return logger
+
+
+# backend/utils/config.py
+"""
+Deployment settings shared across modules
+"""
+
+import os
+
+
+# Web worker processes serving the app. Each one builds its own pools and rate
+# limit buckets, so this must match the server's worker count (1 when unset)
+WEB_WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))